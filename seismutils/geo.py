@@ -6,16 +6,30 @@ E-Mail: gabriele.paoletti@uniroma1.it
 '''
 
 import os
-import pyproj
+import functools
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
-from tqdm import tqdm
-from matplotlib.ticker import MultipleLocator
 from typing import List, Tuple
 
+# matplotlib and pyproj are imported where needed, to keep the module import light
+
+@functools.lru_cache(maxsize=32)
+def _get_utm_transformer(zone: int, units: str, ellps: str, datum: str):
+    # Build the geographical to UTM transformer once per parameter set
+    import pyproj
+    utm_crs = pyproj.CRS(proj='utm', zone=zone, units=units, ellps=ellps, datum=datum)
+    return pyproj.Transformer.from_crs(utm_crs.geodetic_crs, utm_crs, always_xy=True)
+
+@functools.lru_cache(maxsize=32)
+def _get_geographical_transformer(zone: int, northern: bool, units: str, ellps: str, datum: str):
+    # Build the UTM to geographical transformer once per parameter set
+    import pyproj
+    utm_crs = pyproj.CRS(f'+proj=utm +zone={zone} {"+north" if northern else "+south"} +ellps={ellps} +datum={datum} +units={units}')
+    geodetic_crs = pyproj.CRS('epsg:4326')
+    return pyproj.Transformer.from_crs(utm_crs, geodetic_crs, always_xy=True)
+
 def convert_to_geographical(utmx: float | List[float] | np.ndarray | pd.Series, 
                             utmy: float | List[float] | np.ndarray | pd.Series, 
                             zone: int, 
@@ -54,11 +68,11 @@ def convert_to_geographical(utmx: float | List[float] | np.ndarray | pd.Series,
 
     Returns
     -------
-    lon : float or list or np.ndarray or pd.Series
-        The longitude value(s) obtained from the conversion, presented in the same format as the input coordinates.
+    lon : float or np.ndarray
+        The longitude value(s) obtained from the conversion, as a float for scalar input or as a np.ndarray otherwise.
 
-    lat : float or list or np.ndarray or pd.Series
-        The latitude value(s) obtained from the conversion, presented in the same format as the input coordinates.
+    lat : float or np.ndarray
+        The latitude value(s) obtained from the conversion, as a float for scalar input or as a np.ndarray otherwise.
 
     See Also
     --------
@@ -81,12 +95,13 @@ def convert_to_geographical(utmx: float | List[float] | np.ndarray | pd.Series,
         )
         >>> 'Latitude: 13.271772, Longitude: 38.836032'
     '''
-    # Define the geographic and UTM CRS based on the zone and hemisphere
-    utm_crs = pyproj.CRS(f'+proj=utm +zone={zone} +{"+north" if northern else "+south"} +ellps={ellps} +datum={datum} +units={units}')
-    geodetic_crs = pyproj.CRS('epsg:4326')
+    # Retrieve the cached transformer for the given zone and hemisphere
+    transformer = _get_geographical_transformer(zone, northern, units, ellps, datum)
     
-    # Create a Transformer object to convert between CRSs
-    transformer = pyproj.Transformer.from_crs(utm_crs, geodetic_crs, always_xy=True)
+    # Copy bulk data once into float64 arrays and transform them in place
+    if not np.isscalar(utmx):
+        lon, lat = np.array(utmx, dtype=np.float64), np.array(utmy, dtype=np.float64)
+        return transformer.transform(lon, lat, inplace=True)
     
     # Transform the coordinates
     lon, lat = transformer.transform(utmx, utmy)
@@ -127,11 +142,11 @@ def convert_to_utm(lon: float | List[float] | np.ndarray | pd.Series,
 
     Returns
     -------
-    utmx : float or list or np.ndarray or pd.Series
-        The resulting UTM x coordinates (easting), indicating the distance eastward from the central meridian of the UTM zone, presented in the same format as the input coordinates.
+    utmx : float or np.ndarray
+        The resulting UTM x coordinates (easting), indicating the distance eastward from the central meridian of the UTM zone, as a float for scalar input or as a np.ndarray otherwise.
         
-    utmy : float or list or np.ndarray or pd.Series
-        The resulting UTM y coordinates (northing), indicating the distance northward from the equator, presented in the same format as the input coordinates.
+    utmy : float or np.ndarray
+        The resulting UTM y coordinates (northing), indicating the distance northward from the equator, as a float for scalar input or as a np.ndarray otherwise.
 
     See Also
     --------
@@ -155,13 +170,27 @@ def convert_to_utm(lon: float | List[float] | np.ndarray | pd.Series,
         print(f'UTM X: {utmx}, UTM Y: {utmy}')
         >>> 'UTM X: 350, UTM Y: 4300'
     '''
-    # Create a pyproj Proj object for UTM conversion using the given zone and ellipsoid.
-    utm_converter = pyproj.Proj(proj='utm', zone=zone, units=units, ellps=ellps, datum=datum)
+    # Retrieve the cached transformer for the given zone and ellipsoid
+    transformer = _get_utm_transformer(zone, units, ellps, datum)
+
+    # Copy bulk data once into float64 arrays and transform them in place
+    if not np.isscalar(lon):
+        utmx, utmy = np.array(lon, dtype=np.float64), np.array(lat, dtype=np.float64)
+        return transformer.transform(utmx, utmy, inplace=True)
 
     # Transform the coordinates
-    utmx, utmy = utm_converter(np.array(lon), np.array(lat))
+    utmx, utmy = transformer.transform(lon, lat)
     return utmx, utmy
 
+def _distance_point_from_plane(points: np.ndarray, normal: np.ndarray, origins: np.ndarray):
+    # Signed distance of the (3, N) points from each plane (unit normal)
+    d = -(origins @ normal)
+    return np.add(normal @ points, d[:, np.newaxis])
+
+def _section_center_positions(center_x: float, center_y: float, section_centers: np.ndarray, direction: Tuple[float, float]):
+    # Space the section centers along the given unit direction
+    return center_x + section_centers * direction[0], center_y + section_centers * direction[1]
+
 def cross_sections(data: pd.DataFrame,
                    center: Tuple[float, float],
                    num_sections: Tuple[int, int],
@@ -262,90 +291,192 @@ def cross_sections(data: pd.DataFrame,
         The use of this function could be very complex since there are many parameters to manage at the same time. Make sure you read the full tutorial before using it.
     '''
 
-    # Function to calculate the distance of a point from a plane
-    def distance_point_from_plane(x, y, z, normal, origin):
-        d = -normal[0] * origin[0] - normal[1] * origin[1] - normal[2] * origin[2]
-        dist = np.abs(normal[0] * x + normal[1] * y + normal[2] * z + d)
-        dist = dist / np.sqrt(normal[0]**2 + normal[1]**2 + normal[2]**2)
-        return dist
-    
-    def section_center_positions(center_x, center_y, section_centers, strike):
-        angle_rad = np.pi / 2 - np.radians(strike)
-        return center_x + section_centers * np.cos(angle_rad), center_y + section_centers * np.sin(angle_rad)
-    
-    # Make sure all the depths are positive values
-    data.depth = np.abs(data.depth)
-
-    # Convert earthquake data and center to UTM coordinates
-    utmx, utmy = convert_to_utm(data.lon, data.lat, zone=zone, units='km', ellps='WGS84', datum='WGS84' )
-    center_utmx, center_utmy = convert_to_utm(center[0], center[1], zone=zone, units='km', ellps='WGS84', datum='WGS84')
+    # Nothing to plot or return
+    if not plot and not return_dataframes:
+        return []
+
+    # Convert earthquake data and center (appended last) to UTM in one call
+    # The appended arrays are fresh, so transform them in place
+    lon = np.append(data['lon'].to_numpy(dtype=np.float64), center[0])
+    lat = np.append(data['lat'].to_numpy(dtype=np.float64), center[1])
+    utmx, utmy = _get_utm_transformer(zone, 'km', 'WGS84', 'WGS84').transform(lon, lat, inplace=True)
+    center_utmx, center_utmy = float(utmx[-1]), float(utmy[-1])
+    utmx, utmy = utmx[:-1], utmy[:-1]
     
     # Set normal vector for the section based on the provided orientation
-    normal_tostrike = strike - 90
-    normal_ref = [np.cos(normal_tostrike * np.pi / 180), -np.sin(normal_tostrike * np.pi / 180), 0]
+    strike_rad = np.radians(strike)
+    normal_ref = [np.sin(strike_rad), np.cos(strike_rad), 0]
     
     # Calculate center coordinates for each section
-    centers_distro = np.arange(-num_sections[0]*section_distance, num_sections[1]*section_distance+1, section_distance)
-    centers_depths = -10 * np.ones(len(centers_distro))
-    center_xs, center_ys = section_center_positions(center_utmx, center_utmy, centers_distro, strike)
-    center_coords = np.array([center_xs, center_ys, centers_depths]).T
+    n_sections = num_sections[0] + num_sections[1] + 1
+    centers_distro = (np.arange(n_sections) - num_sections[0]) * section_distance
+    center_coords = np.empty((n_sections, 3), dtype=np.float64)
+    center_coords[:, 0], center_coords[:, 1] = _section_center_positions(center_utmx, center_utmy, centers_distro, normal_ref[:2])
+    center_coords[:, 2] = -10
     
-    # List to store dataframes for each section
-    section_dataframes = []
+    # Make sure all the depths are positive values (input dataframe untouched)
+    depth = np.abs(data['depth'].to_numpy(dtype=np.float64))
+    
+    # Keep only the events within the depth range
+    candidates = np.flatnonzero((depth >= depth_range[0]) & (depth <= depth_range[1]))
+    
+    # Offsets from the main center, in single precision
+    points = np.empty((3, len(candidates)), dtype=np.float32)
+    np.subtract(utmx[candidates], center_utmx, out=points[0], casting='same_kind')
+    np.subtract(utmy[candidates], center_utmy, out=points[1], casting='same_kind')
+    np.negative(depth[candidates], out=points[2], casting='same_kind')
+    section_origins = (center_coords - [center_utmx, center_utmy, 0]).astype(np.float32)
+    normal = np.asarray(normal_ref, dtype=np.float32)
+    along_strike = np.array([-normal[1], normal[0], 0], dtype=np.float32)
+    
+    # Distance threshold is the same for every section
+    max_squared_distance = event_distance_from_section**2
+    
+    # Squared distance of events from all section planes, shape (sections, events)
+    squared_dist = _distance_point_from_plane(points, normal, section_origins)
+    np.square(squared_dist, out=squared_dist)
+    
+    # Position of events along each section
+    along_section = _distance_point_from_plane(points, along_strike, section_origins)
+    np.abs(along_section, out=along_section)
+    
+    close_and_in_depth = squared_dist < max_squared_distance
+    close_and_in_depth &= along_section < map_length
+    
+    # Selected events ordered by section, and the bounds of each section
+    section_ids, candidate_indices = np.nonzero(close_and_in_depth)
+    event_indices = candidates[candidate_indices]
+    section_bounds = np.concatenate(([0], np.cumsum(np.count_nonzero(close_and_in_depth, axis=1))))
+    
+    # Position along the section of the selected events only, in full precision
+    on_section_coords = (utmy[event_indices] - center_coords[section_ids, 1]) * normal_ref[0] - (utmx[event_indices] - center_coords[section_ids, 0]) * normal_ref[1]
     
-    for section in range(len(centers_distro)):
+    if plot:
+        import matplotlib.pyplot as plt
+        from matplotlib.ticker import MultipleLocator
+
+        # Axis properties shared by all sections (depth axis inverted)
+        section_axis_properties = {
+            'xlim': (-map_length, map_length),
+            'ylim': (max(depth_range), min(depth_range)),
+            'aspect': 'equal',
+            'facecolor': '#F0F0F0',
+        }
         
-        # Calculate distance of events from each section plane and filter by depth
-        dist = distance_point_from_plane(utmx, utmy, -data['depth'], normal_ref, center_coords[section])
-        in_depth_range = (data['depth'] >= depth_range[0]) & (data['depth'] <= depth_range[1])
-        on_section_coords =+ (utmy - center_coords[section][1]) * normal_ref[0] - (utmx - center_coords[section][0]) * normal_ref[1]
+        # Tick spacing is the same for all the section plots
+        depth_extent = float(np.abs(depth_range).max())
+        x_major_tick, x_minor_tick = map_length/5, map_length/10
+        y_major_tick, y_minor_tick = depth_extent/5, depth_extent/10
         
-        close_and_in_depth = np.where((dist < event_distance_from_section) & in_depth_range & (np.abs(on_section_coords) < map_length))
+        if save_figure:
+            os.makedirs('./seismutils_figures', exist_ok=True)
         
-        if plot:
+        for section in range(n_sections):
+            section_slice = slice(section_bounds[section], section_bounds[section+1])
+            
             # Plot sections
             fig, ax = plt.subplots(figsize=(12, 6))
             
-            ax.scatter(on_section_coords[close_and_in_depth], data.depth.iloc[close_and_in_depth], marker='.', color='black', s=0.25, alpha=0.75)
+            ax.plot(on_section_coords[section_slice], depth[event_indices[section_slice]], linestyle='none', marker='.', markersize=0.5, color='black', alpha=0.75, rasterized=True)
             ax.set_title(f'Section {section+1}', fontsize=14, fontweight='bold')
             
             # Format plot axis
-            ax.xaxis.set_major_locator(MultipleLocator(map_length/5))
+            ax.xaxis.set_major_locator(MultipleLocator(x_major_tick))
             ax.xaxis.set_major_formatter('{x:.0f}')
-            ax.xaxis.set_minor_locator(MultipleLocator(map_length/10))
+            ax.xaxis.set_minor_locator(MultipleLocator(x_minor_tick))
             
-            ax.yaxis.set_major_locator(MultipleLocator(np.abs(depth_range).max()/5))
+            ax.yaxis.set_major_locator(MultipleLocator(y_major_tick))
             ax.yaxis.set_major_formatter('{x:.0f}')
-            ax.yaxis.set_minor_locator(MultipleLocator(np.abs(depth_range).max()/10))
+            ax.yaxis.set_minor_locator(MultipleLocator(y_minor_tick))
             
             ax.set_xlabel('Distance along strike [km]', fontsize=12)
             ax.set_ylabel('Depth [km]', fontsize=12)
-            ax.set_xlim(-map_length, map_length)
-            ax.set_ylim(*depth_range)
-            
-            ax.invert_yaxis()
-            ax.set_aspect('equal')
-            ax.set_facecolor('#F0F0F0')
+            ax.set(**section_axis_properties)
             ax.grid(True, alpha=0.25, linestyle=':')
             
             if save_figure:
-                os.makedirs('./seismutils_figures', exist_ok=True)
                 fig_name = os.path.join('./seismutils_figures', f'{save_name}_{section+1}.{save_extension}')
-                plt.savefig(fig_name, dpi=300, bbox_inches='tight', facecolor=None)
+                fig.savefig(fig_name, dpi=300, bbox_inches='tight', facecolor=None)
             
+            # Release the figure once shown
             plt.show()
+            plt.close(fig)
+    
+    # List to store dataframes for each section
+    section_dataframes = []
+    
+    if return_dataframes:
+        # Take all selected events once, then split them by section
+        sections_df = data.take(event_indices)
+        sections_df['depth'] = depth[event_indices]
+        sections_df['on_section_coords'] = on_section_coords
         
-        # Add the events of this section to the list if return_dataframes is True
-        if return_dataframes:
-            # Add on section coordinates to the dataframe
-            section_df = data.iloc[close_and_in_depth].copy()
-            section_df['on_section_coords'] = on_section_coords[close_and_in_depth]
-            
-            # Append section dataframes to a list
-            section_dataframes.append(section_df)     
+        section_dataframes = [sections_df.iloc[start:stop] for start, stop in zip(section_bounds[:-1], section_bounds[1:])]
     
     return section_dataframes
 
+def _circle_mask(x: np.ndarray, y: np.ndarray, size: Tuple[float, float]):
+    # Points inside the ellipse with semi-axes given by size
+    rx, ry = size
+    if rx == ry:
+        # Circle: compare squared distance with squared radius
+        dist = np.square(x)
+        dist += np.square(y)
+        return dist <= rx*rx
+    
+    dist = np.divide(x, rx)
+    np.square(dist, out=dist)
+    term = np.divide(y, ry)
+    dist += np.square(term, out=term)
+    return dist <= 1
+
+def _square_mask(x: np.ndarray, y: np.ndarray, size: Tuple[float, float]):
+    # Points inside the rectangle with sides given by size
+    width, height = size
+    mask = np.abs(x) <= width/2
+    mask &= np.abs(y) <= height/2
+    return mask
+
+_SHAPE_TESTS = {
+    'circle': _circle_mask,
+    'square': _square_mask,
+}
+
+def _get_shape_test(shape_type: str):
+    try:
+        return _SHAPE_TESTS[shape_type]
+    except KeyError:
+        raise ValueError(f"Invalid shape_type '{shape_type}'. Valid options are {', '.join(repr(k) for k in _SHAPE_TESTS)}.") from None
+
+def _rotate_points(points: np.ndarray, cos_a: float, sin_a: float):
+    # Rotate (2, N) points around the origin
+    rotation_matrix = np.array([[cos_a, -sin_a], [sin_a, cos_a]], dtype=points.dtype)
+    return rotation_matrix @ points
+
+# Points processed at a time by the selection functions
+_SELECTION_CHUNK_SIZE = 65536
+
+def _selection_mask(x: np.ndarray, y: np.ndarray, center: Tuple[float, float], size: Tuple[float, float], rotation: float, shape_test):
+    # Axis-aligned selections skip the rotation
+    rotated = rotation % 360 != 0
+    
+    # Rotation factors as plain floats, so the float32 offsets are not upcast
+    angle_rad = np.deg2rad(-rotation)
+    cos_a, sin_a = float(np.cos(angle_rad)), float(np.sin(angle_rad))
+    
+    # Rotate and test the offsets from the center chunk by chunk
+    mask = np.empty(len(x), dtype=bool)
+    offsets = np.empty((2, min(len(x), _SELECTION_CHUNK_SIZE)), dtype=np.float32)
+    for start in range(0, len(x), _SELECTION_CHUNK_SIZE):
+        chunk = slice(start, start + _SELECTION_CHUNK_SIZE)
+        chunk_offsets = offsets[:, :len(mask[chunk])]
+        np.subtract(x[chunk], center[0], out=chunk_offsets[0], casting='same_kind')
+        np.subtract(y[chunk], center[1], out=chunk_offsets[1], casting='same_kind')
+        
+        rotated_x, rotated_y = _rotate_points(chunk_offsets, cos_a, sin_a) if rotated else chunk_offsets
+        mask[chunk] = shape_test(rotated_x, rotated_y, size)
+    return mask
+
 def select_on_map(data: pd.DataFrame,
                   center: Tuple[float, float],
                   size: Tuple[int, int],
@@ -359,7 +490,8 @@ def select_on_map(data: pd.DataFrame,
                   save_figure: bool=False,
                   save_name: str='selection_map',
                   save_extension: str='jpg',
-                  return_indices: bool=False):
+                  return_indices: bool=False,
+                  return_mask: bool=False):
     '''
     Given an earthquake catalog containing latitude and longitude data, this function facilitates the selection of a subset of events falling within a specified geometric shape centered at a given point.
 
@@ -405,12 +537,15 @@ def select_on_map(data: pd.DataFrame,
         The file extension to use when saving figures, such as 'jpg', 'png', etc... The default extension is 'jpg'.
 
     return_indices : bool, optional
-        If True, the function returns the indices of the points selected within the specified shape. If False, it returns a DataFrame containing the subset of selected data points. Defaults to False.
+        If True, the function returns the positional indices of the points selected within the specified shape. If False, it returns a DataFrame containing the subset of selected data points. Defaults to False.
+
+    return_mask : bool, optional
+        If True, the function returns a boolean array flagging the points selected within the specified shape, one value per row of ``data``. It takes precedence over ``return_indices`` and is convenient to combine multiple selections. Defaults to False.
 
     Returns
     -------
-    List[int] or pd.DataFrame
-        Depending on the ``return_indices`` parameter, this function returns either a list of indices corresponding to the selected points or a DataFrame containing the subset of selected data points.
+    np.ndarray or pd.DataFrame
+        Depending on the ``return_mask`` and ``return_indices`` parameters, this function returns either a boolean mask of the selected points, an integer array with their positional indices (usable with ``data.iloc``) or a DataFrame containing the subset of selected data points.
 
     See Also
     --------
@@ -445,41 +580,17 @@ def select_on_map(data: pd.DataFrame,
     .. warning::
         The use of this function could be very complex since there are many parameters to manage at the same time. Make sure you read the full tutorial before using it.
     '''
-    def rotate_point(point, center, angle):
-        # Rotate a point around a given center by an angle
-        angle_rad = np.deg2rad(angle)
-        ox, oy = center
-        px, py = point
-
-        qx = ox + np.cos(angle_rad) * (px - ox) - np.sin(angle_rad) * (py - oy)
-        qy = oy + np.sin(angle_rad) * (px - ox) + np.cos(angle_rad) * (py - oy)
-        return qx, qy
-    
     # Convert geographic coordinates to UTM (Placeholder logic)
-    utm_x_coords, utm_y_coords = convert_to_utm(data.lon, data.lat, zone, units=units)
-    utm_x_center, utm_y_center = convert_to_utm([center[0]], [center[1]], zone, units=units)
-    center = (utm_x_center[0], utm_y_center[0])
-    coords = (pd.Series(utm_x_coords, name='utm_x'), pd.Series(utm_y_coords, name='utm_y'))
+    x_coords, y_coords = convert_to_utm(data['lon'].to_numpy(), data['lat'].to_numpy(), zone, units=units)
+    center = convert_to_utm(center[0], center[1], zone, units=units)
     
-    selected_indices = []
-    x_coords, y_coords = coords
-    for index in range(len(x_coords)):
-        point = (x_coords.iloc[index], y_coords.iloc[index])
-        rotated_point = rotate_point(point, center, -rotation)
-
-        if shape_type == 'circle':
-            rx, ry = size
-            if ((rotated_point[0] - center[0])/rx)**2 + ((rotated_point[1] - center[1])/ry)**2 <= 1:
-                selected_indices.append(index)
-        
-        elif shape_type == 'square':
-            width, height = size
-            if (center[0] - width/2 <= rotated_point[0] <= center[0] + width/2 and
-                    center[1] - height/2 <= rotated_point[1] <= center[1] + height/2):
-                selected_indices.append(index)
+    mask = _selection_mask(x_coords, y_coords, center, size, rotation, _get_shape_test(shape_type))
 
     # Plotting logic
     if plot:
+        import matplotlib.pyplot as plt
+        from matplotlib.ticker import MultipleLocator
+
         # Determina il valore maggiore tra larghezza e altezza della selezione
         max_dimension = max(size) * buffer_multiplier
 
@@ -488,8 +599,8 @@ def select_on_map(data: pd.DataFrame,
         ylim = (center[1] - max_dimension / 2, center[1] + max_dimension / 2)
 
         fig, ax = plt.subplots(figsize=(10, 10))
-        scatter_plot = ax.scatter(x_coords, y_coords, marker='.', c='grey', s=0.2, alpha=0.75)
-        ax.scatter(x_coords.iloc[selected_indices], y_coords.iloc[selected_indices], marker='.', color='red', s=0.25, alpha=0.75)
+        ax.plot(x_coords, y_coords, linestyle='none', marker='.', markersize=0.45, color='grey', alpha=0.75, rasterized=True)
+        ax.plot(x_coords[mask], y_coords[mask], linestyle='none', marker='.', markersize=0.5, color='red', alpha=0.75, rasterized=True)
         
         if plot_center:
             ax.scatter(center[0], center[1], marker='o', color='red', edgecolor='black', linewidth=0.5,  s=buffer_multiplier*10)
@@ -523,10 +634,12 @@ def select_on_map(data: pd.DataFrame,
         plt.tight_layout()
         plt.show()
 
-    if return_indices:
-        return selected_indices
+    if return_mask:
+        return mask
+    elif return_indices:
+        return np.flatnonzero(mask)
     else:
-        return data.iloc[selected_indices]
+        return data.iloc[mask]
     
 def select_on_section(data: pd.DataFrame,
                       center: Tuple[float, float],
@@ -538,7 +651,8 @@ def select_on_section(data: pd.DataFrame,
                       save_figure: bool=False,
                       save_name: str='selection_section',
                       save_extension: str='jpg',
-                      return_indices: bool=False):
+                      return_indices: bool=False,
+                      return_mask: bool=False):
     '''
     Enables the selection of seismic events within a specified geometric shape on a cross-section derived from earthquake catalog data. It supports selections within circular or square shapes, allowing for targeted analysis of events in specific areas, considering both horizontal distance and depth.
 
@@ -575,12 +689,15 @@ def select_on_section(data: pd.DataFrame,
         The file extension to use when saving figures, such as 'jpg', 'png', etc... The default extension is 'jpg'.
 
     return_indices : bool, optional
-        If True, the function returns the indices of the points selected within the specified shape. If False, it returns a DataFrame containing the subset of selected data points. Defaults to False.
+        If True, the function returns the positional indices of the points selected within the specified shape. If False, it returns a DataFrame containing the subset of selected data points. Defaults to False.
+
+    return_mask : bool, optional
+        If True, the function returns a boolean array flagging the points selected within the specified shape, one value per row of ``data``. It takes precedence over ``return_indices`` and is convenient to combine multiple selections. Defaults to False.
 
     Returns
     -------
-    List[int] or pd.DataFrame
-        Depending on the ``return_indices`` parameter, this function returns either a list of indices corresponding to the selected points or a DataFrame containing the subset of selected data points.
+    np.ndarray or pd.DataFrame
+        Depending on the ``return_mask`` and ``return_indices`` parameters, this function returns either a boolean mask of the selected points, an integer array with their positional indices (usable with ``data.iloc``) or a DataFrame containing the subset of selected data points.
     
     See Also
     --------
@@ -617,40 +734,17 @@ def select_on_section(data: pd.DataFrame,
     .. warning::
         The use of this function could be very complex since there are many parameters to manage at the same time. Make sure you read the full tutorial before using it.
     '''
-    def rotate_point(point, center, angle):
-        # Rotate a point around a given center by an angle
-        angle_rad = np.deg2rad(angle)
-        ox, oy = center
-        px, py = point
-
-        qx = ox + np.cos(angle_rad) * (px - ox) - np.sin(angle_rad) * (py - oy)
-        qy = oy + np.sin(angle_rad) * (px - ox) + np.cos(angle_rad) * (py - oy)
-        return qx, qy
-    
-    coords = (data.on_section_coords, np.abs(data.depth))
-    
-    selected_indices = []
-    x_coords, y_coords = coords
-    for index in range(len(x_coords)):
-        point = (x_coords.iloc[index], y_coords.iloc[index])
-        rotated_point = rotate_point(point, center, -rotation)
-        
-        if shape_type == 'circle':
-            rx, ry = size
-            if ((rotated_point[0] - center[0])/rx)**2 + ((rotated_point[1] - center[1])/ry)**2 <= 1:
-                selected_indices.append(index)
-        
-        elif shape_type == 'square':
-            width, height = size
-            if (center[0] - width/2 <= rotated_point[0] <= center[0] + width/2 and
-                    center[1] - height/2 <= rotated_point[1] <= center[1] + height/2):
-                selected_indices.append(index)
+    x_coords, y_coords = data['on_section_coords'].to_numpy(), np.abs(data['depth'].to_numpy())
+    mask = _selection_mask(x_coords, y_coords, center, size, rotation, _get_shape_test(shape_type))
 
     # Plotting logic
     if plot:
+        import matplotlib.pyplot as plt
+        from matplotlib.ticker import MultipleLocator
+
         fig, ax = plt.subplots(figsize=(12, 6))
-        ax.scatter(x_coords, y_coords, marker='.', color='grey', s=0.25, alpha=0.75)
-        ax.scatter(x_coords.iloc[selected_indices], y_coords.iloc[selected_indices], marker='.', color='red', s=0.25, alpha=0.75)
+        ax.plot(x_coords, y_coords, linestyle='none', marker='.', markersize=0.5, color='grey', alpha=0.75, rasterized=True)
+        ax.plot(x_coords[mask], y_coords[mask], linestyle='none', marker='.', markersize=0.5, color='red', alpha=0.75, rasterized=True)
         
         if plot_center:
             ax.scatter(center[0], center[1], marker='o', color='red', edgecolor='black', linewidth=0.5,  s=150)
@@ -682,7 +776,9 @@ def select_on_section(data: pd.DataFrame,
         
         plt.show()
 
-    if return_indices:
-        return selected_indices
+    if return_mask:
+        return mask
+    elif return_indices:
+        return np.flatnonzero(mask)
     else:
-        return data.iloc[selected_indices]
\ No newline at end of file
+        return data.iloc[mask]
\ No newline at end of file
@@ -6,13 +6,27 @@ E-Mail: gabriele.paoletti@uniroma1.it
 '''
 
 import os
+import functools
 import numpy as np
-import matplotlib.pyplot as plt
 
-import matplotlib.gridspec as gridspec
+from scipy.fft import rfft, irfft, rfftfreq, next_fast_len
+from scipy.signal import butter, sosfilt, sosfiltfilt, get_window, stft
 
-from scipy.signal import butter, sosfilt, sosfiltfilt, get_window, hilbert, stft
-from matplotlib.colors import Normalize
+# matplotlib is imported where needed, to keep the module import light
+
+def _hilbert_envelope(signals: np.ndarray):
+    # Take the Hilbert transform from the one-sided spectrum
+    n_samples = signals.shape[-1]
+    spectrum = rfft(signals, axis=-1, workers=-1)
+    
+    # Shift the phase by -90 degrees, zeroing DC (and Nyquist, for even lengths)
+    spectrum *= -1j
+    spectrum[..., 0] = 0
+    if n_samples % 2 == 0:
+        spectrum[..., -1] = 0
+    hilbert_transform = irfft(spectrum, n=n_samples, axis=-1, workers=-1)
+    
+    return np.hypot(signals, hilbert_transform)
 
 def envelope(signals: np.ndarray,
              envelope_type='positive',
@@ -39,13 +53,13 @@ def envelope(signals: np.ndarray,
         If True, generates plots for the input signal(s) alongside their computed envelope(s). Useful for visual analysis and verification of the envelope computation. Defaults to True.
 
     max_plots : int, optional
-        Specifies the maximum number of signals to plot when `plot` is True and multiple signals are provided. This limit prevents excessive plotting when dealing with large datasets. Defaults to 10.
+        Specifies the maximum number of signals to plot when `plot` is True and multiple signals are provided. The signals are plotted as stacked subplots of a single figure, and this limit prevents excessive plotting when dealing with large datasets. Defaults to 10.
 
     save_figure : bool, optional
-        If set to True, the function saves the generated plots using the provided base name and file extension. The default is False.
+        If set to True, the function saves the generated figure using the provided base name and file extension. The default is False.
 
     save_name : str, optional
-        The base name used for saving figures when `save_figure` is True. It serves as the prefix for file names. The default base name is 'envelope'.
+        The base name used for saving the figure when `save_figure` is True. It serves as the file name. The default base name is 'envelope'.
 
     save_extension : str, optional
         The file extension to use when saving figures, such as 'jpg', 'png', etc... The default extension is 'jpg'.
@@ -73,42 +87,45 @@ def envelope(signals: np.ndarray,
         :align: center
         :target: signal_processing.html#seismutils.signal.envelope
     '''
-    analytical_signal = hilbert(signals, axis=-1)
-    positive_envelope = np.abs(analytical_signal)
+    signals = np.asarray(signals)
+    positive_envelope = _hilbert_envelope(signals)
     negative_envelope = -positive_envelope
     
-    if plot:
-        num_signals_to_plot = signals.shape[0] if signals.ndim > 1 else 1
-        for i in range(min(num_signals_to_plot, max_plots)):
-            plt.figure(figsize=(10, 4))
-            plt.title(f'Envelope {i+1}' if num_signals_to_plot > 1 else 'Envelope', fontsize=14, fontweight='bold')
-            
-            signal_to_plot = signals[i, :] if signals.ndim > 1 else signals
-            pos_envelope_plot = positive_envelope[i, :] if signals.ndim > 1 else positive_envelope
-            neg_envelope_plot = negative_envelope[i, :] if signals.ndim > 1 else negative_envelope
-            
-            plt.plot(signal_to_plot, color='black', linewidth=0.75, label='Signal')
+    # Without any signal to plot no figure is built
+    num_signals = signals.shape[0] if signals.ndim > 1 else 1
+    num_signals_to_plot = min(num_signals, max_plots)
+    
+    if plot and num_signals_to_plot > 0:
+        import matplotlib.pyplot as plt
+
+        # Plot the signals as stacked subplots of a single figure
+        signals_2d = np.atleast_2d(signals)
+        positive_envelopes, negative_envelopes = np.atleast_2d(positive_envelope), np.atleast_2d(negative_envelope)
+        
+        fig, axs = plt.subplots(num_signals_to_plot, 1, figsize=(10, 4*num_signals_to_plot), squeeze=False)
+        for i, ax in enumerate(axs[:, 0]):
+            ax.set_title(f'Envelope {i+1}' if num_signals > 1 else 'Envelope', fontsize=14, fontweight='bold')
+            ax.plot(signals_2d[i], color='black', linewidth=0.75, label='Signal')
             
             if envelope_type in ['positive', 'both']:
-                plt.plot(pos_envelope_plot, color='red', linewidth=0.75, label='Positive envelope')
+                ax.plot(positive_envelopes[i], color='red', linewidth=0.75, label='Positive envelope')
             
             if envelope_type in ['negative', 'both']:
-                plt.plot(neg_envelope_plot, color='blue', linewidth=0.75, label='Negative envelope')
+                ax.plot(negative_envelopes[i], color='blue', linewidth=0.75, label='Negative envelope')
         
-            plt.xlabel('Samples [#]', fontsize=12)
-            plt.ylabel('Amplitude', fontsize=12)
-            plt.xlim(0, len(signal_to_plot))
-            plt.grid(True, alpha=0.25, axis='x', linestyle=':')
-            plt.legend(loc='best', frameon=False, fontsize=12)
-            
-            if save_figure:
-                os.makedirs('./seismutils_figures', exist_ok=True)
-                fig_name = os.path.join('./seismutils_figures', f'{save_name}_{i+1}.{save_extension}')
-                plt.savefig(fig_name, dpi=300, bbox_inches='tight', facecolor=None)
-            
-            plt.show()
-            if i >= (max_plots - 1):
-                break
+            ax.set_xlabel('Samples [#]', fontsize=12)
+            ax.set_ylabel('Amplitude', fontsize=12)
+            ax.set_xlim(0, signals_2d.shape[-1])
+            ax.grid(True, alpha=0.25, axis='x', linestyle=':')
+            ax.legend(loc='best', frameon=False, fontsize=12)
+        
+        fig.tight_layout()
+        if save_figure:
+            os.makedirs('./seismutils_figures', exist_ok=True)
+            fig_name = os.path.join('./seismutils_figures', f'{save_name}.{save_extension}')
+            fig.savefig(fig_name, dpi=300, bbox_inches='tight', facecolor=None)
+        
+        plt.show()
     
     if envelope_type == 'positive':
         return positive_envelope
@@ -117,6 +134,46 @@ def envelope(signals: np.ndarray,
     else:  # 'both'
         return positive_envelope, negative_envelope
 
+@functools.lru_cache(maxsize=128)
+def _butter_sos(order: int, cutoff: float | tuple, sampling_rate: int, filter_type: str):
+    # Design the filter once per parameter set, normalizing the cutoff to Nyquist
+    nyq = 0.5 * sampling_rate
+    if isinstance(cutoff, tuple):  # For bandpass and bandstop filters
+        norm_cutoff = [c / nyq for c in cutoff]
+    else:  # For lowpass and highpass filters
+        norm_cutoff = cutoff / nyq
+    
+    # Create second-order sections for the Butterworth filter
+    return butter(order, norm_cutoff, btype=filter_type, analog=False, output='sos')
+
+@functools.lru_cache(maxsize=32)
+def _taper_window(window_type: str, params: tuple, n_samples: int):
+    # Build the window once per parameter set and length, read-only as it is shared
+    window = get_window((window_type, *params), n_samples) if params else get_window(window_type, n_samples)
+    window.setflags(write=False)
+    return window
+
+def _butter_filter(signals: np.ndarray, order: int, cutoff: float | tuple | list, sampling_rate: int, filter_type: str, mode: str):
+    # Get the cached second-order sections (a cutoff pair must be hashable)
+    cutoff = cutoff if np.isscalar(cutoff) else tuple(cutoff)
+    sos = _butter_sos(order, cutoff, sampling_rate, filter_type)
+    
+    # Apply the filter to the signals along the samples axis
+    if mode in ('zero-phase', 'zero_phase'):
+        # Shorten the default padding for signals shorter than it
+        ntaps = 2 * len(sos) + 1 - min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum())
+        return sosfiltfilt(sos, signals, axis=-1, padlen=min(3 * ntaps, signals.shape[-1] - 1))
+    else:
+        return sosfilt(sos, signals, axis=-1)
+
+def _apply_taper(signals: np.ndarray, window_type: str, params: tuple | list | dict):
+    # Apply a taper to the signals if requested
+    if window_type is not None:
+        # Get the cached window (parameters must be hashable)
+        params = tuple(params.values()) if isinstance(params, dict) else tuple(params or ())
+        return signals * _taper_window(window_type, params, signals.shape[-1])
+    return signals
+
 def filter(signals: np.ndarray, 
            sampling_rate: int,
            filter_type: str,
@@ -155,7 +212,7 @@ def filter(signals: np.ndarray,
         Parameters for the tapering window, applicable only if `taper_window` is not None. These parameters are specific to the chosen window type.
 
     filter_mode : str, optional
-        The filtering mode, which can be 'butterworth' for a smooth frequency response or 'zero-phase' for filtering without introducing phase shifts.
+        The filtering mode, which can be 'butterworth' for a smooth frequency response or 'zero-phase' for filtering without introducing phase shifts. Zero-phase filtering pads the signal(s) at both ends, and the padding is reduced for signals shorter than it.
 
     Returns
     -------
@@ -205,46 +262,21 @@ def filter(signals: np.ndarray,
         :align: center
         :target: signal_processing.html#seismutils.signal.filter
     '''
-    def butter_filter(order, cutoff, sampling_rate, filter_type, mode):
-        # Normalize the cutoff frequency with respect to Nyquist frequency
-        nyq = 0.5 * sampling_rate
-        if isinstance(cutoff, (list, tuple)):  # For bandpass and bandstop filters
-            norm_cutoff = [c / nyq for c in cutoff]
-        else:  # For lowpass and highpass filters
-            norm_cutoff = cutoff / nyq
-        
-        # Create second-order sections for the Butterworth filter
-        sos = butter(order, norm_cutoff, btype=filter_type, analog=False, output='sos')
-        
-        # Return a function that applies the filter to a signal x
-        if mode == 'zero_phase':
-            return lambda x: sosfiltfilt(sos, x)
-        else:
-            return lambda x: sosfilt(sos, x)
-
-    def apply_taper(signal, window_type, params):
-        # Apply a taper to the signal if requested
-        if window_type is not None:
-            # Generate the window with the given parameters
-            window = get_window((window_type, *params), len(signal)) if params else get_window(window_type, len(signal))
-            return signal * window
-        return signal
-    
-    # Ensure signals is a 2D array for consistency
-    signals = np.atleast_2d(signals)
+    # Work on C-contiguous 2D signals, remembering the original shape
+    signals = np.asarray(signals)
+    was_1d = signals.ndim == 1
+    signals = np.ascontiguousarray(np.atleast_2d(signals))
     
-    # Create the filter function
-    filter_func = butter_filter(order, cutoff, sampling_rate, filter_type, filter_mode)
+    # Apply the taper and the filter to all the signals at once, along the samples axis
+    tapered_signals = _apply_taper(signals, taper_window, taper_params)
+    filtered_signals = _butter_filter(tapered_signals, order, cutoff, sampling_rate, filter_type, filter_mode)
     
-    # Apply the filter and taper to each signal
-    filtered_signals = []
-    for signal in signals:
-        tapered_signal = apply_taper(signal, taper_window, taper_params)
-        filtered_signal = filter_func(tapered_signal)
-        filtered_signals.append(filtered_signal)
+    # Filter in double precision, but return single precision signals as such
+    if signals.dtype == np.float32:
+        filtered_signals = filtered_signals.astype(np.float32)
     
     # Return the filtered signals in their original shape
-    return np.squeeze(filtered_signals)
+    return filtered_signals[0] if was_1d else filtered_signals
 
 def fourier_transform(signals: np.ndarray,
                       sampling_rate: int,
@@ -254,9 +286,11 @@ def fourier_transform(signals: np.ndarray,
                       max_plots=10,
                       save_figure=False,
                       save_name: str='fourier_transform',
-                      save_extension: str='jpg'):
+                      save_extension: str='jpg',
+                      pad: bool=False,
+                      return_magnitude: bool=False):
     '''
-    Performs a Fourier Transform on one or more signals, offering optional amplitude spectrum plotting. This function leverages NumPy's Fast Fourier Transform (FFT) to decompose signals into their frequency components.
+    Performs a Fourier Transform on one or more signals, offering optional amplitude spectrum plotting. This function leverages SciPy's real-input Fast Fourier Transform (FFT) to decompose signals into their frequency components.
     
     .. note::
         The function supports both one-dimensional arrays and multi-dimensional arrays with each row as a separate signal.
@@ -290,10 +324,19 @@ def fourier_transform(signals: np.ndarray,
     save_extension : str, optional
         The file extension to use when saving figures, such as 'jpg', 'png', etc... The default extension is 'jpg'.
 
+    pad : bool, optional
+        If True, the signal(s) are zero-padded to the next length for which the FFT is fast (see ``scipy.fft.next_fast_len``), which can considerably speed up the transform of lengths with large prime factors. The frequency bins are adjusted accordingly. Defaults to False.
+
+    return_magnitude : bool, optional
+        If True, the function returns the amplitude spectrum (the plotted, one-sided amplitudes) instead of the complex Fourier Transform, which is convenient and lighter on memory when the phase is not needed. Defaults to False.
+
     Returns
     -------
-    np.ndarray
-        The computed Fourier Transform of the input signal(s), up to the Nyquist frequency. This includes the positive frequency components and their corresponding frequency bins, structured as a numpy array.
+    ft : np.ndarray
+        The computed Fourier Transform of the input signal(s) (or its amplitude spectrum, if ``return_magnitude`` is True), normalized by the number of samples and up to the Nyquist frequency. Its shape is ``(N // 2 + 1,)`` for a single signal, or ``(num_signals, N // 2 + 1)`` for multiple signals, where ``N`` is the (possibly padded) transform length.
+
+    freq : np.ndarray
+        The positive frequency bins, in Hz, corresponding to the last axis of ``ft``.
 
     See Also
     --------
@@ -321,27 +364,27 @@ def fourier_transform(signals: np.ndarray,
     '''
 
     # Adjust for multidimensional input
-    if signals.ndim == 1:
+    single_waveform = signals.ndim == 1
+    if single_waveform:
         signals = signals[np.newaxis, :]  # Make 1D array 2D for uniform processing
     multiple_waveforms = signals.shape[0] > 1
 
-    # Initialize a list to hold Fourier Transform results
-    ft_results, freqs = [], []
+    # Compute the one-sided FFT, normalized by the number of actual samples
+    N = signals.shape[-1]
+    n_fft = next_fast_len(N, real=True) if pad else N
+    ft = rfft(signals, n=n_fft, axis=-1, workers=-1) / N
+    freq = rfftfreq(n_fft, d=1/sampling_rate)
+
+    # Compute the amplitude spectra once (doubled for the one-sided FFT)
+    if plot or return_magnitude:
+        amplitude_spectra = np.abs(ft if return_magnitude else ft[:max_plots])
+        amplitude_spectra *= 2
+
+    if plot:
+        import matplotlib.pyplot as plt
 
-    for index, signal in enumerate(signals):
         # Limit plotting to max_plots
-        if index >= max_plots:
-            break
-        
-        # Compute the Fourier Transform using NumPy's FFT
-        ft = np.fft.fft(signal)
-        freq = np.fft.fftfreq(signal.size, d=1/sampling_rate)
-        N = signal.size
-        ft = ft / N  # Normalize the amplitudes
-        ft_results.append(ft[:N // 2])  # Store positive frequency components
-        freqs.append(freq)
-
-        if plot:
+        for index, signal in enumerate(signals[:max_plots]):
             # Plot setup
             if plot_waveform:
                 fig, axs = plt.subplots(2, 1, figsize=(10, 8), gridspec_kw={'height_ratios': [1, 3]})
@@ -364,9 +407,7 @@ def fourier_transform(signals: np.ndarray,
 
             # Plot the Fourier Transform
             ax = axs[-1]
-            half_point = N // 2
-            freq = freq[:half_point]
-            amplitude_spectrum = np.abs(ft)[:half_point] * 2  # Multiply by 2 to account for symmetrical nature of FFT output
+            amplitude_spectrum = amplitude_spectra[index]
 
             if log_scale:
                 ax.loglog(freq, amplitude_spectrum, color='black', linewidth=0.75)
@@ -379,14 +420,17 @@ def fourier_transform(signals: np.ndarray,
             ax.grid(True, alpha=0.25, which='both', linestyle=':')
 
             plt.tight_layout()
-            if save_figure and index < max_plots:
+            if save_figure:
                 os.makedirs('./seismutils_figures', exist_ok=True)
                 fig_name = f'./seismutils_figures/{save_name}_{index+1}.{save_extension}'
                 plt.savefig(fig_name, dpi=300, bbox_inches='tight')
 
             plt.show()
 
-    return np.array(ft_results), np.array(freqs) if multiple_waveforms else ft_results[0], freqs[0]
+    # Return the amplitude spectra in place of the complex transform, if requested
+    if return_magnitude:
+        ft = amplitude_spectra
+    return ft[0] if single_waveform else ft, freq
 
 def spectrogram(signals: np.ndarray,
                 sampling_rate: int,
@@ -481,19 +525,22 @@ def spectrogram(signals: np.ndarray,
         :align: center
         :target: spectral_analysis.html#seismutils.signal.spectrogram
     '''
+    import matplotlib.pyplot as plt
+    import matplotlib.gridspec as gridspec
+    from matplotlib.colors import Normalize
 
     spectrogram_data = []
 
-    # If signals is 1D array, convert it to 2D array with one row
+    # If signals is 1D array, view it as a 2D array with one row
     if signals.ndim == 1:
-        signals = np.array([signals])
+        signals = signals[np.newaxis, :]
 
     # Limit the number of signals to plot
     num_signals = min(len(signals), max_plots)
 
     for i, signal in enumerate(signals[:num_signals]):
-        # Normalize the signal by subtracting the mean
-        signal -= np.mean(signal)
+        # Normalize the signal by subtracting the mean, without modifying the input signals
+        signal = signal - np.mean(signal)
 
         # If noverlap is not set, set it to 75% of nperseg
         if noverlap is None: